@@ -1,9 +1,13 @@
 import configparser
+import json
 from configparser import ConfigParser
-from os import getpid, kill, makedirs, path, system
+from datetime import datetime, timedelta
+from heapq import heapify, heappop, heappush
+from math import isfinite
+from os import getpid, kill, makedirs, path, replace, system
 from signal import SIGTERM
 from sys import argv, stderr
-from threading import Thread
+from threading import Condition, Thread
 from time import sleep, time
 
 from requests import RequestException
@@ -66,13 +70,434 @@ class User:
         self.value = tuple(one_pair_dict.values())[0]
 
 
+class CronExpression:
+    # Expresión de 5 campos al estilo cron: "minuto hora día-del-mes mes día-de-la-semana"
+    # Cada campo admite '*', valores, rangos 'a-b', pasos '/n' y listas separadas por comas.
+
+    __FIELDS = (
+        ("minute", 0, 59),
+        ("hour", 0, 23),
+        ("day", 1, 31),
+        ("month", 1, 12),
+        ("weekday", 0, 7),
+    )
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+
+        if len(fields) != 5:
+            raise ValueError("la expresión cron debe tener 5 campos")
+
+        self.expression = " ".join(fields)
+
+        (
+            self.minutes,
+            self.hours,
+            self.days,
+            self.months,
+            self.weekdays,
+        ) = (
+            self.__parse_field(field, name, low, high)
+            for field, (name, low, high) in zip(fields, self.__FIELDS)
+        )
+
+        self.weekdays = {day % 7 for day in self.weekdays}  # 0 y 7 son domingo
+        self.__any_day = fields[2].startswith("*")
+        self.__any_weekday = fields[4].startswith("*")
+
+    @staticmethod
+    def __parse_field(field: str, name: str, low: int, high: int) -> set:
+        values = set()
+
+        for part in field.split(","):
+            range_, sep, step = part.partition("/")
+
+            try:
+                step = int(step) if step else 1
+
+                if range_ == "*":
+                    start, end = low, high
+                elif "-" in range_:
+                    start, end = map(int, range_.split("-", 1))
+                else:
+                    start = int(range_)
+                    end = high if sep else start
+
+            except ValueError:
+                raise ValueError("campo '%s' inválido: '%s'" % (name, part))
+
+            if step < 1 or not low <= start <= end <= high:
+                raise ValueError("campo '%s' fuera de rango: '%s'" % (name, part))
+
+            values.update(range(start, end + 1, step))
+
+        return values
+
+    def __day_matches(self, moment: datetime) -> bool:
+        # Igual que en cron: si ambos campos están restringidos basta con que coincida uno
+        in_days = moment.day in self.days
+        in_weekdays = (moment.weekday() + 1) % 7 in self.weekdays
+
+        if self.__any_day or self.__any_weekday:
+            return in_days and in_weekdays
+
+        return in_days or in_weekdays
+
+    def next_time(self, after: float) -> float:
+        # Devuelve el primer instante (en segundos desde la época) posterior a 'after'
+        moment = datetime.fromtimestamp(after).replace(
+            second=0, microsecond=0
+        ) + timedelta(minutes=1)
+        limit = moment + timedelta(days=366 * 5)
+
+        while moment < limit:
+            if moment.month not in self.months:
+                moment = (moment.replace(day=28) + timedelta(days=4)).replace(
+                    day=1, hour=0, minute=0
+                )
+
+            elif not self.__day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+
+            else:
+                # En la hora repetida al terminar el horario de verano la misma hora local
+                # ocurre dos veces; 'fold=1' selecciona la segunda
+                for candidate in (moment, moment.replace(fold=1)):
+                    if candidate.timestamp() > after:
+                        return candidate.timestamp()
+
+                moment += timedelta(minutes=1)
+
+        raise ValueError("la expresión cron '%s' nunca se cumple" % self.expression)
+
+
+def parse_schedule_time(when: str) -> tuple[float, str | None]:
+    # Interpreta el momento de envío de un mensaje programado. Formatos aceptados:
+    #   "+30s", "+10m", "+2h", "+1d"   -> relativo al momento actual
+    #   "AAAA-MM-DD HH:MM"             -> fecha y hora exactas
+    #   "HH:MM"                        -> hoy (o mañana si esa hora ya pasó)
+    #   "*/5 * * * *"                  -> recurrente, expresión cron de 5 campos
+    # Devuelve el instante del primer envío y la expresión cron (o None si es de un solo envío)
+
+    when = when.strip()
+    now = time()
+
+    if len(when.split()) == 5:
+        cron = CronExpression(when)
+        return cron.next_time(now), cron.expression
+
+    if when.startswith("+"):
+        units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+        try:
+            seconds = float(when[1:-1]) * units[when[-1].lower()]
+        except (KeyError, ValueError):
+            raise ValueError("intervalo inválido: '%s'" % when)
+
+        if not isfinite(seconds):
+            raise ValueError("intervalo inválido: '%s'" % when)
+
+        if seconds <= 0:
+            raise ValueError("el intervalo debe ser positivo: '%s'" % when)
+
+        try:
+            datetime.fromtimestamp(now + seconds)
+        except (OverflowError, OSError, ValueError):
+            raise ValueError("intervalo demasiado grande: '%s'" % when)
+
+        return now + seconds, None
+
+    for format_ in ("%Y-%m-%d %H:%M", "%Y-%m-%d %H:%M:%S"):
+        try:
+            due = datetime.strptime(when, format_).timestamp()
+        except ValueError:
+            continue
+
+        if due <= now:
+            raise ValueError("la fecha '%s' ya pasó" % when)
+
+        return due, None
+
+    try:
+        hour = datetime.strptime(when, "%H:%M")
+    except ValueError:
+        raise ValueError("formato de fecha no reconocido: '%s'" % when)
+
+    moment = datetime.now().replace(
+        hour=hour.hour, minute=hour.minute, second=0, microsecond=0
+    )
+
+    if moment.timestamp() <= now:
+        moment += timedelta(days=1)
+
+    return moment.timestamp(), None
+
+
+class Scheduler:
+    # Cola de mensajes programados ordenada por el instante de envío (montículo binario).
+    # Insertar y extraer cuestan O(log n); las entradas eliminadas se descartan al llegar
+    # a la cima del montículo. Cada cambio se añade como una línea JSON al final del
+    # archivo de programaciones, que se compacta al cargarlo o cuando crece demasiado.
+
+    __MIN_COMPACT_RECORDS = 1000
+
+    def __init__(self, file_path: str, send):
+        self.__file_path = file_path
+        self.__send = send
+        self.__heap = []
+        self.__entries = {}
+        self.__next_id = 1
+        self.__records = 0
+        self.__condition = Condition()
+
+        self.load()
+
+    def load(self) -> None:
+        try:
+            with open(self.__file_path, "r", encoding="utf-8") as file:
+                lines = file.readlines()
+
+        except FileNotFoundError:
+            return
+
+        except OSError:
+            stderr.write(
+                "%serror%s: no se pudo leer el archivo de mensajes programados '%s'\n"
+                % (Colors.RED, Colors.RESET, self.__file_path)
+            )
+            return
+
+        with self.__condition:
+            for line in lines:
+                try:
+                    self.__apply(json.loads(line))
+
+                except (ValueError, KeyError, TypeError):
+                    pass  # Línea incompleta, p. ej. si el programa se cerró mientras escribía
+
+            self.__heap = [(entry["due"], id_) for id_, entry in self.__entries.items()]
+            heapify(self.__heap)
+
+            try:
+                self.__compact()
+            except OSError as e:
+                self.__report_write_error(e)
+
+    @staticmethod
+    def __check_int(value) -> int:
+        if not isinstance(value, int) or isinstance(value, bool):
+            raise ValueError("se esperaba un entero: %r" % (value,))
+
+        return value
+
+    @staticmethod
+    def __check_due(value) -> float:
+        if (
+            not isinstance(value, (int, float))
+            or isinstance(value, bool)
+            or not isfinite(value)
+        ):
+            raise ValueError("instante de envío inválido: %r" % (value,))
+
+        return value
+
+    def __apply(self, record: dict) -> None:
+        # Reproduce una línea del archivo de programaciones. Todo se valida antes de
+        # modificar el estado, así una línea rechazada no deja rastro.
+        if record["op"] == "add":
+            entry = record["entry"]
+            cron = entry["cron"]
+
+            if not isinstance(entry["text"], str):
+                raise ValueError("texto inválido: %r" % (entry["text"],))
+
+            if cron is not None:
+                if not isinstance(cron, str):
+                    raise ValueError("expresión cron inválida: %r" % (cron,))
+
+                CronExpression(cron).next_time(time())  # Lanza ValueError si no es válida
+
+            entry = {
+                "id": self.__check_int(entry["id"]),
+                "chat_id": self.__check_int(entry["chat_id"]),
+                "text": entry["text"],
+                "due": self.__check_due(entry["due"]),
+                "cron": cron,
+            }
+
+            self.__entries[entry["id"]] = entry
+            self.__next_id = max(self.__next_id, entry["id"] + 1)
+
+        elif record["op"] == "due":
+            due = self.__check_due(record["due"])
+            self.__entries[record["id"]]["due"] = due
+
+        elif record["op"] == "remove":
+            self.__entries.pop(record["id"], None)
+
+        elif record["op"] == "next_id":
+            self.__next_id = max(self.__next_id, self.__check_int(record["id"]))
+
+    def __write(self, records: list[dict]) -> None:
+        # Debe llamarse con 'self.__condition' adquirido. Un fallo de escritura se informa
+        # pero no se propaga: las programaciones siguen activas en memoria.
+        try:
+            makedirs(path.dirname(self.__file_path), exist_ok=True)
+
+            with open(self.__file_path, "a", encoding="utf-8") as file:
+                file.writelines(
+                    json.dumps(record, ensure_ascii=False) + "\n" for record in records
+                )
+
+            self.__records += len(records)
+
+            if self.__records > max(
+                self.__MIN_COMPACT_RECORDS, 2 * len(self.__entries)
+            ):
+                self.__compact()
+
+        except OSError as e:
+            self.__report_write_error(e)
+
+    def __report_write_error(self, error: OSError) -> None:
+        stderr.write(
+            "%serror%s: no se pudo guardar el archivo de mensajes programados '%s': %s\n"
+            % (Colors.RED, Colors.RESET, self.__file_path, error)
+        )
+
+    def __compact(self) -> None:
+        # Reescribe el archivo con una línea por programación viva
+        temp_path = self.__file_path + ".tmp"
+
+        makedirs(path.dirname(self.__file_path), exist_ok=True)
+
+        with open(temp_path, "w", encoding="utf-8") as file:
+            file.write(json.dumps({"op": "next_id", "id": self.__next_id}) + "\n")
+            file.writelines(
+                json.dumps({"op": "add", "entry": entry}, ensure_ascii=False) + "\n"
+                for entry in self.__entries.values()
+            )
+
+        replace(temp_path, self.__file_path)
+        self.__records = len(self.__entries) + 1
+
+    def add(self, chat_id: int, text: str, due: float, cron: str | None = None) -> int:
+        with self.__condition:
+            id_ = self.__next_id
+            self.__next_id += 1
+
+            entry = {
+                "id": id_,
+                "chat_id": chat_id,
+                "text": text,
+                "due": due,
+                "cron": cron,
+            }
+            self.__entries[id_] = entry
+            heappush(self.__heap, (due, id_))
+            self.__write([{"op": "add", "entry": entry}])
+
+            self.__condition.notify()
+
+        return id_
+
+    def remove(self, id_: int) -> bool:
+        with self.__condition:
+            if self.__entries.pop(id_, None) is None:
+                return False
+
+            self.__write([{"op": "remove", "id": id_}])
+
+        return True
+
+    @property
+    def schedules(self) -> list[dict]:
+        with self.__condition:
+            return sorted(
+                (dict(entry) for entry in self.__entries.values()),
+                key=lambda entry: entry["due"],
+            )
+
+    def start(self) -> None:
+        Thread(target=self.__run, daemon=True).start()
+
+    def __pop_due(self, now: float) -> tuple[list[dict], list[dict]]:
+        # Extrae las entradas vencidas y vuelve a encolar las recurrentes
+        due_entries, records = [], []
+
+        while self.__heap and self.__heap[0][0] <= now:
+            due, id_ = heappop(self.__heap)
+            entry = self.__entries.get(id_)
+
+            if entry is None or entry["due"] != due:  # Eliminada o reprogramada
+                continue
+
+            due_entries.append(dict(entry))
+
+            if entry["cron"]:
+                # Los envíos perdidos mientras el bot estaba apagado se agrupan en uno solo
+                try:
+                    next_due = CronExpression(entry["cron"]).next_time(max(now, due))
+
+                    if next_due <= now:
+                        raise ValueError("la siguiente ejecución no es posterior a la actual")
+
+                except ValueError as e:
+                    stderr.write(
+                        "%serror%s: el mensaje programado #%d deja de repetirse: %s\n"
+                        % (Colors.RED, Colors.RESET, id_, e)
+                    )
+
+                else:
+                    entry["due"] = next_due
+                    heappush(self.__heap, (next_due, id_))
+                    records.append({"op": "due", "id": id_, "due": next_due})
+                    continue
+
+            del self.__entries[id_]
+            records.append({"op": "remove", "id": id_})
+
+        return due_entries, records
+
+    def __run(self) -> None:
+        while True:
+            with self.__condition:
+                while not self.__heap or self.__heap[0][0] > time():
+                    self.__condition.wait(
+                        self.__heap[0][0] - time() if self.__heap else None
+                    )
+
+                due_entries, records = self.__pop_due(time())
+
+                if records:
+                    self.__write(records)
+
+            for entry in due_entries:
+                try:
+                    self.__send(entry)
+
+                except Exception as e:
+                    stderr.write(
+                        "%serror%s: no se pudo enviar el mensaje programado #%d: %s\n"
+                        % (Colors.RED, Colors.RESET, entry["id"], e)
+                    )
+
+
 class Bot(TeleBot):
     __NAME_DATA_FOLDER = "TBC-data"
     __NAME_CONFIG_FILE = "tbc.ini"
     __NAME_BACKUP_FILE = "messages-backup.txt"
+    __NAME_SCHEDULES_FILE = "schedules.jsonl"
     __ABS_DATA_FOLDER = "{}/{}/".format(path.dirname(__file__), __NAME_DATA_FOLDER)
     __CONFIG_FILE = __ABS_DATA_FOLDER + __NAME_CONFIG_FILE
     __BACKUP_FILE = __ABS_DATA_FOLDER + __NAME_BACKUP_FILE
+    __SCHEDULES_FILE = __ABS_DATA_FOLDER + __NAME_SCHEDULES_FILE
 
     def __init__(self, fast_init: bool = False, timeout: int = 10):
         self.config = ConfigParser()
@@ -99,6 +524,9 @@ class Bot(TeleBot):
             self.paperclip_on = False
             self.start_time = time()
 
+            self.scheduler = Scheduler(self.__SCHEDULES_FILE, self.__send_scheduled)
+            self.scheduler.start()
+
     def set_my_commands(
         self,
         commands: list[BotCommand],
@@ -428,6 +856,18 @@ class Bot(TeleBot):
 
         return 1
 
+    def chat_name(self, chat_id: int) -> str:
+        return self.users.get(chat_id, self.groups.get(chat_id, str(chat_id)))
+
+    def __send_scheduled(self, entry: dict) -> None:
+        # Envía un mensaje programado por la vía normal de envío
+        if self.send_message(entry["chat_id"], entry["text"]) == 0:
+            # El texto ya quedó guardado por 'send_message', aquí solo se avisa del envío
+            self.print_and_save(
+                "Mensaje programado #%d enviado a %s"
+                % (entry["id"], self.chat_name(entry["chat_id"]))
+            )
+
     def match_user_by_first_letter(self, to_match) -> tuple[int, str]:
         def starts_with_that(x):
             return to_match.lower().startswith("/{} ".format(x.lower()))
@@ -573,6 +1013,80 @@ def main() -> int:
                         print("%s: %d" % (key, value))
                     continue
 
+                # Programar un mensaje (único o recurrente) para el usuario actual
+                elif entrada in ["/schedule", "/programar"]:
+                    cuando = input(
+                        "Ingrese cuándo enviarlo (+10m, AAAA-MM-DD HH:MM, HH:MM o expresión cron): "
+                    )
+
+                    if cuando.strip() == "":
+                        print("Continuando...")
+                        continue
+
+                    try:
+                        due, cron = parse_schedule_time(cuando)
+
+                    except ValueError as e:
+                        print("Fecha no válida: %s" % e)
+                        continue
+
+                    entrada = input("Ingrese el mensaje: ").strip()
+
+                    if entrada == "":
+                        print("Continuando...")
+                        continue
+
+                    schedule_id = bot.scheduler.add(id, entrada, due, cron)
+                    print(
+                        "Mensaje #%d programado para %s el %s%s"
+                        % (
+                            schedule_id,
+                            bot.chat_name(id),
+                            datetime.fromtimestamp(due).strftime("%Y-%m-%d %H:%M:%S"),
+                            " (recurrente: %s)" % cron if cron else "",
+                        )
+                    )
+                    continue
+
+                # Mostrar por consola la lista de mensajes programados
+                elif entrada in ["/schedules", "/programados"]:
+                    schedules = bot.scheduler.schedules
+
+                    if not schedules:
+                        print("No hay mensajes programados")
+
+                    for entry in schedules:
+                        print(
+                            "#%d [%s] %s%s: %s"
+                            % (
+                                entry["id"],
+                                datetime.fromtimestamp(entry["due"]).strftime(
+                                    "%Y-%m-%d %H:%M:%S"
+                                ),
+                                bot.chat_name(entry["chat_id"]),
+                                " (%s)" % entry["cron"] if entry["cron"] else "",
+                                entry["text"],
+                            )
+                        )
+                    continue
+
+                # Cancelar un mensaje programado
+                elif entrada in ["/unschedule", "/desprogramar"]:
+                    entrada = input("Ingrese el número del mensaje programado: ")
+
+                    try:
+                        schedule_id = int(entrada.strip("# "))
+
+                    except ValueError:
+                        print("Continuando...")
+                        continue
+
+                    if bot.scheduler.remove(schedule_id):
+                        print("Mensaje #%d cancelado" % schedule_id)
+                    else:
+                        print("No existe el mensaje programado #%d" % schedule_id)
+                    continue
+
                 # Enviar al bot todo lo que se copie en el portapapeles
                 elif entrada in ["/clipboard", "/portapapeles", "/cp"]:
                     print(